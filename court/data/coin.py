@@ -1,7 +1,6 @@
 # -*- coding: UTF-8 -*-
-__metaclass__ = type
 import re
-import urlparse
+from urllib.parse import urljoin
 from rdflib import Graph, Literal, Namespace, URIRef, RDF, RDFS
 
 
@@ -25,7 +24,7 @@ class URIMinter:
 class URISpace:
 
     def __init__(self, resource):
-        self.base = unicode(resource.value(COIN.base))
+        self.base = str(resource.value(COIN.base))
         self.templates = [Template(self, template_resource)
                 for template_resource in resource.objects(COIN.template)]
         self.slugTransform = SlugTransformer(resource.value(COIN.slugTransform))
@@ -53,10 +52,10 @@ class SlugTransformer:
         self.spaceRepl = resource and resource.value(
                 COIN.spaceReplacement) or u'+'
         self.stripPattern = resource and re.compile(
-                unicode(resource.value(COIN.stripPattern))) or None
+                str(resource.value(COIN.stripPattern))) or None
 
     def __call__(self, value):
-        value = unicode(value)
+        value = str(value)
         for transform in self.applyTransforms:
             if transform.identifier == COIN.ToLowerCase:
                 value = value.lower()
@@ -75,7 +74,7 @@ class SlugTransformer:
 
 
 def replacer(replacements):
-    char_pairs = [unicode(repl).split(u' ') for repl in replacements]
+    char_pairs = [str(repl).split(u' ') for repl in replacements]
     def replace(value):
         for char, repl in char_pairs:
             value = value.replace(char, repl)
@@ -113,18 +112,18 @@ class Template:
             return None
         if not self.uriTemplate:
             return None # TODO: one value, fragmentTemplate etc..
-        expanded = unicode(self.uriTemplate)
+        expanded = str(self.uriTemplate)
         expanded = expanded.replace("{+base}", base)
         for var, value in matches.items():
             slug = self.space.transform_value(value)
             expanded = expanded.replace("{%s}" % var, slug)
-        return urlparse.urljoin(base, expanded)
+        return urljoin(base, expanded)
 
     def get_base(self, resource):
         base = self.space.base
         def guarded_base(b):
             if b:
-                s = unicode(b.identifier)
+                s = str(b.identifier)
                 if s.startswith(base):
                     return s
         if self.relToBase:
@@ -182,13 +181,13 @@ if __name__ == '__main__':
         parse_file(instance_data, source)
 
     for space_uri in coin_graph.subjects(RDF.type, COIN.URISpace):
-        print "URI Space <%s>:" % space_uri
+        print("URI Space <%s>:" % space_uri)
         minter = URIMinter(coin_graph, space_uri)
         for subj, uris in minter.compute_uris(instance_data).items():
-            if unicode(subj) in uris:
-                print "Found <%s> in" % subj,
+            if str(subj) in uris:
+                print("Found <%s> in" % subj, end=" ")
             else:
-                print "Did not find <%s> in" % subj,
-            print ", ".join(("<%s>" % uri) for uri in uris)
+                print("Did not find <%s> in" % subj, end=" ")
+            print(", ".join(("<%s>" % uri) for uri in uris))
 
 
@@ -0,0 +1,251 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+C implementation of the URIFS scan in ``court.util.urifs``, working on
+buffers of code points. The functions here mirror those of the pure Python
+implementation, which should be consulted for the details.
+"""
+from cpython.mem cimport PyMem_Malloc, PyMem_Free
+from cpython.unicode cimport PyUnicode_FromKindAndData, PyUnicode_4BYTE_KIND
+
+
+def uri_to_path(unicode uri not None):
+    cdef Py_ssize_t n = len(uri)
+    # escapes at most triple the length, and splits at most make five chars
+    # of each char scanned
+    cdef Py_UCS4 *escaped = <Py_UCS4 *> PyMem_Malloc(
+            (3 * n + 1) * sizeof(Py_UCS4))
+    cdef Py_UCS4 *run = <Py_UCS4 *> PyMem_Malloc(
+            (3 * n + 4) * sizeof(Py_UCS4))
+    cdef Py_UCS4 *path = <Py_UCS4 *> PyMem_Malloc(
+            (15 * n + 16) * sizeof(Py_UCS4))
+    cdef Py_ssize_t length
+    try:
+        if not escaped or not run or not path:
+            raise MemoryError()
+        length = _escape(uri, escaped)
+        length = _scan(escaped, length, path, run)
+        return PyUnicode_FromKindAndData(PyUnicode_4BYTE_KIND, path, length)
+    finally:
+        PyMem_Free(escaped)
+        PyMem_Free(run)
+        PyMem_Free(path)
+
+
+cdef inline bint _is_hex(Py_UCS4 c):
+    return '0' <= c <= '9' or 'a' <= c <= 'f'
+
+cdef inline bint _is_digit(Py_UCS4 c):
+    return '0' <= c <= '9'
+
+cdef inline bint _is_split_char(Py_UCS4 c):
+    return c == '@' or c == ':' or c == '?' or c == '!' or c == '#'
+
+cdef inline Py_ssize_t _put(Py_UCS4 *path, Py_ssize_t k, unicode s):
+    cdef Py_UCS4 c
+    for c in s:
+        path[k] = c
+        k += 1
+    return k
+
+cdef inline Py_ssize_t _copy(Py_UCS4 *path, Py_ssize_t k,
+        Py_UCS4 *uri, Py_ssize_t start, Py_ssize_t end):
+    while start < end:
+        path[k] = uri[start]
+        k += 1
+        start += 1
+    return k
+
+
+cdef Py_ssize_t _escape(unicode uri, Py_UCS4 *escaped):
+    cdef Py_ssize_t k = 0
+    cdef Py_UCS4 c
+    for c in uri:
+        if c == '%':
+            k = _put(escaped, k, u'%25')
+        elif c == '^':
+            k = _put(escaped, k, u'%5E')
+        elif c == '$':
+            k = _put(escaped, k, u'%24')
+        elif c == '|':
+            k = _put(escaped, k, u'%7C')
+        elif c == '*':
+            k = _put(escaped, k, u'%2A')
+        elif c == '&':
+            k = _put(escaped, k, u'%26')
+        else:
+            escaped[k] = c
+            k += 1
+    return k
+
+
+cdef Py_ssize_t _scan(Py_UCS4 *uri, Py_ssize_t n, Py_UCS4 *path,
+        Py_UCS4 *run):
+    cdef Py_ssize_t i = 0, start = 0, j, end, k = 0
+    cdef int tz_digits
+    cdef Py_UCS4 c
+    while i < n:
+        c = uri[i]
+        if _is_hex(c):
+            j = _hex_end(uri, i + 1, n)
+            if j - i < 4 or j == n or uri[j] != '-':
+                i = j
+                continue
+            k = _copy(path, k, uri, start, i)
+            k = _scan_hex_split(uri, i, j + 1, n, path, k, run, &i)
+        elif c == 'T':
+            end = _time_end(uri, i, n, &tz_digits)
+            if end < 0:
+                i += 1
+                continue
+            k = _copy(path, k, uri, start, i)
+            path[k] = 'T'
+            k = _copy(path, k + 1, uri, i + 1, i + 3)
+            k = _put(path, k, u'%3A')
+            k = _copy(path, k, uri, i + 4, i + 6)
+            k = _put(path, k, u'%3A^/')
+            k = _copy(path, k, uri, i + 7, end)
+            i = end
+            j = _hex_end(uri, end, n)
+            if (tz_digits and tz_digits + j - end >= 4 and
+                    j < n and uri[j] == '-'):
+                k = _scan_hex_split(uri, end, j + 1, n, path, k, run, &i)
+        elif c == '/' and (i + 1 == n or uri[i + 1] != '/'):
+            i += 1
+            continue
+        elif c == '/' or _is_split_char(c):
+            k = _copy(path, k, uri, start, i)
+            j = _run_end(uri, i, n)
+            if j < n and uri[j] == '/':
+                j += 1
+            k = _split_run(uri + i, j - i, path, k)
+            i = j
+        else:
+            i += 1
+            continue
+        start = i
+    return _copy(path, k, uri, start, n)
+
+
+cdef Py_ssize_t _scan_hex_split(Py_UCS4 *uri, Py_ssize_t head,
+        Py_ssize_t i, Py_ssize_t n, Py_UCS4 *path, Py_ssize_t k,
+        Py_UCS4 *run, Py_ssize_t *end):
+    cdef Py_ssize_t j
+    k = _copy(path, k, uri, head, i)
+    k = _put(path, k, u'^/')
+    while _is_month_day(uri, i, n):
+        k = _copy(path, k, uri, i, i + 5)
+        k = _put(path, k, u'^/')
+        i += 5
+        j = _hex_end(uri, i, n)
+        if j - i < 2 or j == n or uri[j] != '-':
+            break
+        k = _copy(path, k, uri, i, j + 1)
+        k = _put(path, k, u'^/')
+        i = j + 1
+    end[0] = _slashes_end(uri, i, n)
+    if end[0] > i:
+        # the inserted slash is part of the following split
+        run[0] = '/'
+        j = _copy(run, 1, uri, i, end[0])
+        k = _split_run(run, j, path, k - 1)
+    return k
+
+cdef inline Py_ssize_t _hex_end(Py_UCS4 *uri, Py_ssize_t i, Py_ssize_t n):
+    while i < n and _is_hex(uri[i]):
+        i += 1
+    return i
+
+cdef inline bint _is_month_day(Py_UCS4 *uri, Py_ssize_t i, Py_ssize_t n):
+    return (i + 5 <= n and uri[i + 2] == '-' and
+            _is_digit(uri[i]) and _is_digit(uri[i + 1]) and
+            _is_digit(uri[i + 3]) and _is_digit(uri[i + 4]))
+
+cdef Py_ssize_t _time_end(Py_UCS4 *uri, Py_ssize_t i, Py_ssize_t n,
+        int *tz_digits):
+    cdef Py_ssize_t j
+    cdef int k
+    if i + 9 > n or uri[i + 3] != ':' or uri[i + 6] != ':':
+        return -1
+    for k in (1, 2, 4, 5, 7, 8):
+        if not _is_digit(uri[i + k]):
+            return -1
+    i += 9
+    if (i + 4 <= n and uri[i] == '.' and _is_digit(uri[i + 1]) and
+            _is_digit(uri[i + 2]) and _is_digit(uri[i + 3])):
+        i += 4
+    if i < n and uri[i] == 'Z':
+        tz_digits[0] = 0
+        return i + 1
+    if i < n and (uri[i] == '+' or uri[i] == '-'):
+        j = i + 1
+        while j < n and j - i <= 4 and _is_digit(uri[j]):
+            j += 1
+        if j - i > 3:
+            tz_digits[0] = j - i - 1
+            return j
+    return -1
+
+cdef Py_ssize_t _run_end(Py_UCS4 *uri, Py_ssize_t i, Py_ssize_t n):
+    while i < n:
+        if _is_split_char(uri[i]):
+            i += 1
+        elif uri[i] == '/' and i + 1 < n and uri[i + 1] == '/':
+            i += 2
+            while i < n and uri[i] == '/':
+                i += 1
+        else:
+            break
+    return i
+
+cdef Py_ssize_t _slashes_end(Py_UCS4 *uri, Py_ssize_t i, Py_ssize_t n):
+    if i == n or uri[i] != '/':
+        return i
+    while i < n and uri[i] == '/':
+        i += 1
+    i = _run_end(uri, i, n)
+    if i < n and uri[i] == '/':
+        i += 1
+    return i
+
+cdef Py_ssize_t _split_run(Py_UCS4 *run, Py_ssize_t n, Py_UCS4 *path,
+        Py_ssize_t k):
+    # Writes the run followed by "^/" (or "^//" for a single slash following
+    # the split), escaping splitting chars and pairs of slashes, and any
+    # slash left before the "^".
+    cdef Py_ssize_t i = 0, slashes
+    cdef bint single_slash = (run[n - 1] == '/' and
+            (n == 1 or run[n - 2] != '/'))
+    cdef Py_UCS4 c
+    if single_slash:
+        n -= 1
+    while i < n:
+        c = run[i]
+        if c == '/':
+            slashes = 0
+            while i < n and run[i] == '/':
+                slashes += 1
+                i += 1
+            while slashes >= 2:
+                k = _put(path, k, u'%2F%2F')
+                slashes -= 2
+            if slashes and i == n:
+                k = _put(path, k, u'%2F')
+            elif slashes:
+                path[k] = '/'
+                k += 1
+            continue
+        elif c == ':':
+            k = _put(path, k, u'%3A')
+        elif c == '!':
+            k = _put(path, k, u'%21')
+        elif c == '?':
+            k = _put(path, k, u'%3F')
+        elif c == '#':
+            k = _put(path, k, u'%23')
+        else:
+            path[k] = c
+            k += 1
+        i += 1
+    if single_slash:
+        return _put(path, k, u'^%2F%2F')
+    return _put(path, k, u'^/')
@@ -25,6 +25,10 @@ The canonical algorithm is defined as primitive, chained regular expression
 based mechanism, which allows it to be used in URL rewrite capable web servers,
 such as Apache, Nginx, Lighttd, etc.
 
+These chained expressions are kept as ``REWRITE_PATTERNS``. The functions
+here apply them in a single scan over the URI, which gives the same result as
+rewriting with each in turn.
+
 Examples
 ------------------------------------------------------------------------
 
@@ -32,12 +36,12 @@ Given the following test function:
 
     >>> def test(uri):
     ...     fspath = uri_to_fspath(uri)
-    ...     print "Filepath:", fspath
+    ...     print("Filepath:", fspath)
     ...     newuri = fspath_to_uri(fspath)
     ...     assert newuri == uri, newuri
-    ...     print "Filetree:"
-    ...     print "".join(("/\\n" if i else "")+("  "*(i+1))+part
-    ...         for i, part in enumerate(fspath.split('/')))
+    ...     print("Filetree:")
+    ...     print("".join(("/\\n" if i else "")+("  "*(i+1))+part
+    ...         for i, part in enumerate(fspath.split('/'))))
 
 Here are some examples of how URI:s are turned into file system paths::
 
@@ -107,11 +111,11 @@ It also works for some bizarre cases, like multiple slashes::
 """
 import re
 import os.path
-from functools import partial
-from urllib import unquote
+from functools import lru_cache
+from urllib.parse import unquote_to_bytes
 
 
-REWRITE_PATTERNS = [
+REWRITE_PATTERNS = (
     # escape escapes (so we can escape more stuff)
     (r'%', r'%25'),
     # escape chars (those we consider ok in URL:s but not in the fs)
@@ -120,12 +124,12 @@ REWRITE_PATTERNS = [
     (r'\|', r'%7C'),
     (r'\*', r'%2A'),
     ('&', '%26'),
-    # split on uuid-like or year
-    (r'([0-9a-f]{4,}-)', r'\1^/'),
+    # split on uuid-like or year (only trying from the start of a hex run)
+    (r'(?<![0-9a-f])([0-9a-f]{4,}-)', r'\1^/'),
     # split on month-day (after rewritten year)
-    (r'\^/(\d\d-\d\d)', r'^/\1^/'),
+    (r'\^/([0-9]{2}-[0-9]{2})', r'^/\1^/'),
     # split time (Thh:mm:, ss.millisTZ))
-    (r'(T\d\d):(\d\d):(\d\d(?:\.\d{3})?(?:[+-]\d\d?\d\d|Z))',
+    (r'(T[0-9]{2}):([0-9]{2}):([0-9]{2}(?:\.[0-9]{3})?(?:[+-][0-9]{3,4}|Z))',
             r'\1%3A\2%3A^/\3'),
     # splitting chars including multiple slashes
     (r'((?:/{2,}|[@:?!#])+)', r'\1^/'),
@@ -137,22 +141,203 @@ REWRITE_PATTERNS = [
     # escaped multiple slashes (brittle..)
     (r'//', r'%2F%2F'),
     (r'/\^', r'%2F^'),
-]
+)
+
+
+# After the escapes, the patterns above are applied in a single left-to-right
+# scan, where each token which the chained rewrites would treat as a unit
+# (including the splits that earlier rewrites make for later ones to act on) is
+# rewritten at once.
+
+ESCAPES = (('%', '%25'), ('^', '%5E'), ('$', '%24'), ('|', '%7C'),
+        ('*', '%2A'), ('&', '%26'))
+
+SPLIT_ESCAPES = ((':', '%3A'), ('!', '%21'), ('?', '%3F'), ('#', '%23'),
+        ('//', '%2F%2F'), ('/^', '%2F^'))
 
+_HEX = frozenset('0123456789abcdef')
+_DIGITS = frozenset('0123456789')
+_TZ_SIGNS = frozenset('+-')
+_SPLIT_CHARS = frozenset('@:?!#')
 
-uri_transforms = [partial(re.compile(exp).sub, repl)
-    for exp, repl in REWRITE_PATTERNS]
+# the characters which may start a token (others are copied as is)
+_TOKEN_STARTS = _HEX | _SPLIT_CHARS | frozenset('/T')
 
 
+# Without any of these, no pattern applies and the URI is used as is. (Splits
+# of hex and date parts need a hyphen, and splits of time a colon.)
+_REWRITE_CHARS = re.compile(r'[-%^$|*&@:?!#]|//')
+
 def uri_to_path(uri):
-    return reduce(lambda path, transform:
-            transform(path), uri_transforms, uri)
+    if not _REWRITE_CHARS.search(uri):
+        return uri
+    for char, escaped in ESCAPES:
+        if char in uri:
+            uri = uri.replace(char, escaped)
+    return "".join(_scan_uri(uri))
+
+try:
+    # C version of the above, if built
+    from court.util._urifs import uri_to_path
+except ImportError:
+    pass
+
+def _scan_uri(uri):
+    out = []
+    append = out.append
+    n = len(uri)
+    i = start = 0
+    while i < n:
+        c = uri[i]
+        if c not in _TOKEN_STARTS:
+            i += 1
+            continue
+        if c in _HEX:
+            j = i + 1
+            while j < n and uri[j] in _HEX:
+                j += 1
+            if j - i < 4 or uri[j:j+1] != '-':
+                i = j
+                continue
+            append(uri[start:i])
+            path, i = _scan_hex_split(uri, uri[i:j+1], j + 1, n)
+        elif c == 'T':
+            time = _time_end(uri, i, n)
+            if not time:
+                i += 1
+                continue
+            append(uri[start:i])
+            end, tz_digits = time
+            path = "T%s%%3A%s%%3A^/%s" % (
+                    uri[i+1:i+3], uri[i+4:i+6], uri[i+7:end])
+            i = end
+            j = _hex_end(uri, end, n)
+            if tz_digits and tz_digits + j - end >= 4 and uri[j:j+1] == '-':
+                tz_path, i = _scan_hex_split(uri, uri[end:j+1], j + 1, n)
+                path += tz_path
+        elif c == '/' and uri[i+1:i+2] != '/':
+            i += 1
+            continue
+        else:
+            append(uri[start:i])
+            j = _run_end(uri, i, n)
+            if uri[j:j+1] == '/':
+                j += 1
+            run = uri[i:j]
+            path, i = _SPLIT_RUN_PATHS.get(run) or _split_run(run), j
+        append(path)
+        start = i
+    append(uri[start:])
+    return out
+
+
+def _scan_hex_split(uri, head, i, n):
+    # the split after a hex part (head) and any month-day parts following it,
+    # each either last or followed by another hex split
+    parts = [head, '^/']
+    while _is_month_day(uri[i:i+5]):
+        parts += uri[i:i+5], '^/'
+        i += 5
+        j = _hex_end(uri, i, n)
+        if j - i < 2 or uri[j:j+1] != '-':
+            break
+        parts += uri[i:j+1], '^/'
+        i = j + 1
+    end = _slashes_end(uri, i, n)
+    if end > i:
+        # the inserted slash is part of the following split
+        parts[-1] = '^'
+        parts.append(_split_run('/' + uri[i:end]))
+    return "".join(parts), end
+
+def _hex_end(uri, i, n):
+    while i < n and uri[i] in _HEX:
+        i += 1
+    return i
+
+def _is_month_day(s):
+    return (len(s) == 5 and s[2] == '-' and s[0] in _DIGITS and
+            s[1] in _DIGITS and s[3] in _DIGITS and s[4] in _DIGITS)
+
+def _time_end(uri, i, n):
+    # Thh:mm:ss(.millis)?(TZ|Z), returning its end and the number of TZ digits
+    s = uri[i:i+9]
+    if not (len(s) == 9 and s[3] == ':' and s[6] == ':' and
+            all(s[k] in _DIGITS for k in (1, 2, 4, 5, 7, 8))):
+        return None
+    i += 9
+    if uri[i:i+1] == '.' and len(uri[i+1:i+4]) == 3 and all(
+            c in _DIGITS for c in uri[i+1:i+4]):
+        i += 4
+    c = uri[i:i+1]
+    if c == 'Z':
+        return i + 1, 0
+    if c in _TZ_SIGNS:
+        j = i + 1
+        while j < n and j - i <= 4 and uri[j] in _DIGITS:
+            j += 1
+        if j - i > 3:
+            return j, j - i - 1
+    return None
+
+def _run_end(uri, i, n):
+    # splitting chars and multiple slashes
+    while i < n:
+        if uri[i] in _SPLIT_CHARS:
+            i += 1
+        elif uri[i:i+2] == '//':
+            i += 2
+            while i < n and uri[i] == '/':
+                i += 1
+        else:
+            break
+    return i
+
+def _slashes_end(uri, i, n):
+    # slashes joining the slash of an inserted split
+    if uri[i:i+1] != '/':
+        return i
+    while i < n and uri[i] == '/':
+        i += 1
+    i = _run_end(uri, i, n)
+    if uri[i:i+1] == '/':
+        i += 1
+    return i
+
+def _split_run(run):
+    if run.endswith('/') and not run.endswith('//'):
+        # a single slash following the split
+        path = run[:-1] + '^//'
+    else:
+        path = run + '^/'
+    for char, escaped in SPLIT_ESCAPES:
+        path = path.replace(char, escaped)
+    return path
+
+# the common split runs, rewritten in advance
+_SPLIT_RUN_PATHS = dict((run, _split_run(run)) for run in
+        list(_SPLIT_CHARS) + [c + '/' for c in _SPLIT_CHARS] + ['://', '//'])
+
+# Results of uri_to_fspath are cached, since the same URIs tend to be mapped
+# over and over. Call uri_to_fspath.cache_clear() to drop the cache when
+# mapping many unique URIs.
+FSPATH_CACHE_SIZE = 4096
+
+_SEP = os.path.sep
 
-def uri_to_fspath(uri, pathsep=os.path.sep):
-    return pathsep.join(uri_to_path(uri).split('/'))
+@lru_cache(maxsize=FSPATH_CACHE_SIZE)
+def uri_to_fspath(uri, pathsep=_SEP, /):
+    if pathsep == '/':
+        return uri_to_path(uri)
+    return uri_to_path(uri).replace('/', pathsep)
 
-def fspath_to_uri(path, pathsep=os.path.sep):
-    return "/".join(map(unquote, path.split(pathsep))).replace('^/', '')
+def fspath_to_uri(path, pathsep=_SEP, /):
+    if pathsep != '/':
+        path = path.replace(pathsep, '/')
+    # Remove the inserted splits before decoding, so that any escaped "^" in
+    # the URI is kept. (If followed by a slash, the split slash is escaped.)
+    path = path.replace('^/', '').replace('^%2F', '')
+    return unquote_to_bytes(path).decode('utf-8', 'replace')
 
 
 if __name__ == '__main__':
@@ -161,8 +346,8 @@ if __name__ == '__main__':
     args = argv[1:]
     if '-f' in args:
       args.remove('-f')
-      print fspath_to_uri(args[0])
+      print(fspath_to_uri(args[0]))
     else:
-      print uri_to_fspath(args[0])
+      print(uri_to_fspath(args[0]))
 
 
@@ -1,17 +1,20 @@
 # -*- coding: UTF-8 -*-
 from setuptools import setup, find_packages
-# Nasty hack to make e.g. setup.py register read PKG-INFO as utf-8.. {{{
-import sys
-reload(sys) # setdefaultencoding is deleted in site.py..
-sys.setdefaultencoding('utf-8')
-# }}}
+
+# Build the C version of the URIFS scan if Cython is available.
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    ext_modules = []
+else:
+    ext_modules = cythonize(["court/util/_urifs.pyx"])
 
 setup(
     name = "COURT",
     version = "0.1.0a1",
     description = """An API for crafting organization using resources over time.""",
     long_description = """
-    %s""" % "".join(open("README.txt")),
+    %s""" % "".join(open("README.txt", encoding="utf-8")),
     classifiers = [
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
@@ -19,17 +22,20 @@ setup(
         "License :: OSI Approved :: BSD License",
         "Operating System :: OS Independent",
         "Programming Language :: Python",
+        "Programming Language :: Python :: 3",
         "Topic :: Software Development :: Libraries",
         "Topic :: Software Development :: Libraries :: Python Modules",
         "Topic :: Database",
         ],
     keywords = "content repository database rdf atom",
     platforms = ["any"],
+    python_requires = ">=3.8",
     author = "Niklas Lindström",
     author_email = "lindstream@gmail.com",
     license = "BSD",
     url = "http://purl.org/court/",
     packages = find_packages(exclude=["test.*", "test"]),
+    ext_modules = ext_modules,
     include_package_data = True,
     zip_safe = False,
     test_suite = 'nose.collector',
@@ -0,0 +1,38 @@
+import re
+from court.util.urifs import REWRITE_PATTERNS, uri_to_fspath, fspath_to_uri
+
+
+chained_transforms = tuple((re.compile(exp), repl)
+        for exp, repl in REWRITE_PATTERNS)
+
+def chained_uri_to_path(uri):
+    for exp, repl in chained_transforms:
+        uri = exp.sub(repl, uri)
+    return uri
+
+
+test_data = [
+    (
+        "http://example.org/define-abc/feedface-0000-4000-8000-deadbeef0000",
+        "http%3A%2F%2F^/example.org/define-abc/"
+            "feedface-^/0000-^/4000-^/8000-^/deadbeef0000"
+    ),
+    (
+        "http://example.org/def-/cafe-/2011-02-12T16:32:00+0100",
+        "http%3A%2F%2F^/example.org/def-/"
+            "cafe-^%2F%2F^/2011-^/02-12^/T16%3A32%3A^/00+0100"
+    ),
+    (
+        "urn:x-abc:12-ab&cd-^/x",
+        "urn%3A^/x-abc%3A^/12-ab%26cd-^/%5E/x"
+    ),
+]
+
+def test_uri_to_fspath():
+    for uri, fspath in test_data:
+        yield check_uri_to_fspath, uri, fspath
+
+def check_uri_to_fspath(uri, fspath):
+    assert uri_to_fspath(uri, '/') == fspath, uri_to_fspath(uri, '/')
+    assert chained_uri_to_path(uri) == fspath, chained_uri_to_path(uri)
+    assert fspath_to_uri(fspath, '/') == uri, fspath_to_uri(fspath, '/')